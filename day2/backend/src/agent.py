@@ -1,9 +1,16 @@
+import asyncio
+import functools
 import logging
-import json
+import os
+import secrets
+import sqlite3
+import sys
 import time
-import uuid
-from threading import Lock
+from typing import Optional
+import orjson
 from dotenv import load_dotenv
+# pydantic (used for tool schemas) rejects typing.TypedDict before Python 3.12
+from typing_extensions import TypedDict
 from livekit.agents import (
     Agent,
     AgentSession,
@@ -26,9 +33,149 @@ logger = logging.getLogger("agent")
 load_dotenv(".env.local")
 
 
-# File & lock for safe writes
+# Completed orders
+ORDERS_DB = "orders.db"
+# Legacy JSON-lines file; imported into ORDERS_DB the first time the table is empty
 ORDERS_FILE = "orders.json"
-_orders_file_lock = Lock()
+
+_ORDERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders(
+    id TEXT PRIMARY KEY,
+    ts REAL,
+    room TEXT,
+    payload BLOB
+);
+"""
+
+
+def _to_row(record: dict) -> tuple:
+    return (record["id"], record["timestamp"], record.get("room"), orjson.dumps(record["order"]))
+
+
+def _import_legacy_orders(conn: sqlite3.Connection) -> None:
+    """One-time import of ORDERS_FILE; INSERT OR IGNORE makes a concurrent import from another worker harmless."""
+    rows = []
+    with open(ORDERS_FILE, "rb") as f:
+        for line in f:
+            try:
+                rows.append(_to_row(orjson.loads(line)))
+            except Exception:
+                continue  # Skip bad lines
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?)", rows)
+    logger.info(f"Imported {len(rows)} order(s) from {ORDERS_FILE}")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    Opens the orders database in WAL mode, so LiveKit job processes can write
+    concurrently (the old threading lock only covered a single process).
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_ORDERS_SCHEMA)
+    if os.path.exists(ORDERS_FILE) and conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None:
+        _import_legacy_orders(conn)
+    return conn
+
+
+class AsyncOrderWriter:
+    """
+    Buffers finalized orders in memory and inserts them into the database in batches.
+    A background task drains the queue every `batch_size` records or
+    `flush_interval` seconds, so tools never block the event loop on disk I/O.
+    Each batch is one transaction; with WAL + synchronous=NORMAL the fsync is
+    deferred to checkpoints, which happen at the latest when the connection closes.
+    Create one per job: the queue, lock and flush task belong to the event loop that
+    started them, and jobs run on separate loops (threads in `console` mode and on Windows).
+    """
+
+    def __init__(self, path: str, batch_size: int = 10, flush_interval: float = 0.5) -> None:
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        # created lazily in start() so they bind to the running event loop
+        self._queue = None
+        self._lock = None
+        self._task = None
+        # opened in start(), from a worker thread
+        self._conn = None
+
+    async def start(self) -> None:
+        """Starts the flush task and opens the database (schema, legacy import) off the event loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flush_loop())
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await asyncio.to_thread(_connect, self._path)
+
+    async def enqueue(self, record: dict) -> asyncio.Future:
+        """
+        Queues a record and returns a future that resolves once its batch is done:
+        True when committed (visible to readers), False if the write failed.
+        """
+        if self._queue is None:
+            await self.start()
+        committed = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, committed))
+        return committed
+
+    async def drain(self) -> None:
+        """Wait for every queued record to be written, then close the database."""
+        if self._queue is not None:
+            await self._queue.join()
+            self._task.cancel()
+            async with self._lock:
+                await asyncio.to_thread(self.close)
+
+    def close(self) -> None:
+        # closing the last connection checkpoints the WAL into the main database file
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            ok = False
+            try:
+                await self._write(batch)
+                ok = True
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} record(s) to {self._path}")
+            finally:
+                for _, committed in batch:
+                    if not committed.done():
+                        committed.set_result(ok)
+                    self._queue.task_done()
+
+    async def _write(self, batch: list) -> None:
+        rows = [_to_row(r) for r, _ in batch]
+        async with self._lock:
+            await asyncio.to_thread(self._insert_rows, rows)
+
+    def _insert_rows(self, rows: list) -> None:
+        # one transaction per batch
+        if self._conn is None:
+            self._conn = _connect(self._path)
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?)", rows)
+
+
 
 # Canonical options (menu)
 VALID_SIZES = {
@@ -63,14 +210,46 @@ VALID_EXTRAS = {
     "whip": "Whipped Cream",
 }
 
+# Field -> menu lookup, keyed on case-folded input so non-ASCII casing still matches.
+# Canonical values are interned so order_state holds one shared copy of each.
+_FIELD_MAPS = {
+    "size": {k.casefold(): sys.intern(v) for k, v in VALID_SIZES.items()},
+    "milk": {k.casefold(): sys.intern(v) for k, v in VALID_MILKS.items()},
+    "extras": {k.casefold(): sys.intern(v) for k, v in VALID_EXTRAS.items()},
+}
+# "Valid ..." lists for error messages, built once instead of per failed lookup
+_VALID_VALUES_STR = {k: ", ".join(sorted(set(v.values()))) for k, v in _FIELD_MAPS.items()}
+
+
+@functools.lru_cache(maxsize=256)
+def _norm(s: str) -> str:
+    """Strips and case-folds a menu term. Cached: the menu vocabulary is tiny, so this is mostly a dict probe."""
+    s = s.strip()
+    return s.lower() if s.isascii() else s.casefold()
+
+
+# One entry of an update_fields() batch. Typed so the tool schema has explicit
+# properties; Gemini rejects OBJECT parameters without any.
+class FieldUpdate(TypedDict):
+    field: str
+    value: str
+
+
 # Items that clearly are not a drink — quick blacklist
 INVALID_DRINK_TERMS = {"beer", "pizza", "wine", "burger", "fries"}
 
+# Blank order; copied with a fresh extras list for every new order
+_EMPTY_ORDER = {
+    "drinkType": None,
+    "size": None,
+    "milk": None,
+    "extras": None,
+    "name": None,
+}
 
-class Assistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(
-            instructions="""
+
+# System prompt shared by every Assistant session
+_ASSISTANT_INSTRUCTIONS = """
 You are Sam, a warm, high-energy barista at a coffee shop.
 Use the provided tools to collect an order using the schema:
 {
@@ -84,42 +263,93 @@ Use the provided tools to collect an order using the schema:
 RULES (must follow):
 -Begin a conversation with "Welcome to starbucks.what can i get you?"
 - Ask exactly one question at a time until all required fields are filled.
-- Always use update_order(field, value) to update fields; do NOT claim a field was updated unless you called the tool.
+- Always use update_order(field, value) or update_fields(updates) to update fields; do NOT claim a field was updated unless you called the tool.
 - Use get_missing_fields() to determine which fields remain.
 - When all required fields are present, call finalize_order() to save the order.
-- If user provides multiple pieces of info in one utterance, update the relevant fields via update_order() for each piece found.
+- If user provides multiple pieces of info in one utterance, update all of them in a single update_fields() call.
 - If user asks "what milks do you have", list the menu options.
 - If user requests an invalid item (e.g. "pizza", "beer"), politely refuse: "We only serve coffee and pastries here!"
 - If user asks for a size not in menu, respond: "I wish we had that! But the biggest I can do is a Trenta. Should we go with that?"
 - Keep replies short, friendly, and clear.
 """
+
+
+class Assistant(Agent):
+    def __init__(self, order_writer: Optional[AsyncOrderWriter] = None) -> None:
+        super().__init__(
+            instructions=_ASSISTANT_INSTRUCTIONS
         )
 
+        # the job's order writer (entrypoint passes one it drains on shutdown)
+        self.order_writer = order_writer or AsyncOrderWriter(ORDERS_DB)
+
         # per-instance order state (prevent cross-session leakage)
-        self.order_state = {
-            "drinkType": None,
-            "size": None,
-            "milk": None,
-            "extras": [],
-            "name": None,
-        }
+        self.order_state = dict(_EMPTY_ORDER, extras=[])
 
     # -------------------------
     # Helper: compute missing fields
     # -------------------------
+    # extras is optional (add it here if you want extras required)
+    _REQUIRED = ("drinkType", "size", "milk", "name")
+
     def _missing_fields(self):
-        # extras is optional (tweak here if you want extras required)
-        missing = []
-        if not self.order_state.get("drinkType"):
-            missing.append("drinkType")
-        if not self.order_state.get("size"):
-            missing.append("size")
-        if not self.order_state.get("milk"):
-            missing.append("milk")
-        # extras optional: do not include if empty
-        if not self.order_state.get("name"):
-            missing.append("name")
-        return missing
+        state = self.order_state
+        return [f for f in self._REQUIRED if not state[f]]
+
+    # -------------------------
+    # Helper: apply one field update
+    # -------------------------
+    def _apply_update(self, field: str, value: str):
+        """Validates and applies a single field update; shared by update_order and update_fields."""
+        field = field.strip()
+        if field not in ("drinkType", "size", "milk", "extras", "name"):
+            return {"ok": False, "error": f"Unknown field: {field}"}
+
+        if field in ("size", "milk"):
+            if not isinstance(value, str) or not value.strip():
+                return {"ok": False, "error": f"Empty {field} value"}
+            mapped = _FIELD_MAPS[field].get(_norm(value))
+            if not mapped:
+                # follow persona rule - suggest Trenta if user wanted an impossible size
+                return {"ok": False, "error": f"Unknown {field} '{value}'. Valid {field}s: {_VALID_VALUES_STR[field]}"}
+            self.order_state[field] = mapped
+
+        elif field == "extras":
+            if not isinstance(value, str) or not value.strip():
+                return {"ok": True, "order_state": self.order_state}  # nothing to add
+            extras_map = _FIELD_MAPS["extras"]
+            # dict.fromkeys de-duplicates while keeping the order the user gave
+            parts = dict.fromkeys(_norm(p) for p in value.split(",") if p.strip())
+            unknown = parts.keys() - extras_map.keys()
+            if unknown:
+                # report every unknown extra at once; nothing is added
+                names = ", ".join(f"'{p}'" for p in sorted(unknown))
+                return {"ok": False, "error": f"Unknown extra(s) {names}. Valid extras: {_VALID_VALUES_STR['extras']}"}
+            existing = set(self.order_state["extras"])
+            added = []
+            for p in parts:
+                mapped = extras_map[p]
+                if mapped not in existing:
+                    existing.add(mapped)
+                    added.append(mapped)
+            self.order_state["extras"].extend(added)
+            return {"ok": True, "order_state": self.order_state, "added": added}
+
+        elif field == "drinkType":
+            if not isinstance(value, str) or not value.strip():
+                return {"ok": False, "error": "Empty drinkType"}
+            v = value.strip()
+            # quick blacklist check
+            if v.lower() in INVALID_DRINK_TERMS:
+                return {"ok": False, "error": "We only serve coffee and pastries here."}
+            self.order_state["drinkType"] = v
+
+        elif field == "name":
+            if not isinstance(value, str) or not value.strip():
+                return {"ok": False, "error": "Empty name"}
+            self.order_state["name"] = value.strip()
+
+        return {"ok": True, "order_state": self.order_state}
 
     # -------------------------
     # TOOL: update_order
@@ -132,63 +362,34 @@ RULES (must follow):
         Normalizes sizes, milks and extras.
         """
         try:
-            field = field.strip()
-            if field not in ("drinkType", "size", "milk", "extras", "name"):
-                return {"ok": False, "error": f"Unknown field: {field}"}
-
-            if field == "size":
-                if not isinstance(value, str) or not value.strip():
-                    return {"ok": False, "error": "Empty size value"}
-                v = value.strip().lower()
-                mapped = VALID_SIZES.get(v)
-                if not mapped:
-                    # follow persona rule - suggest Trenta if user wanted an impossible size
-                    return {"ok": False, "error": f"Unknown size '{value}'. Valid sizes: {', '.join(sorted(set(VALID_SIZES.values())))}"}
-                self.order_state["size"] = mapped
-
-            elif field == "milk":
-                if not isinstance(value, str) or not value.strip():
-                    return {"ok": False, "error": "Empty milk value"}
-                v = value.strip().lower()
-                mapped = VALID_MILKS.get(v)
-                if not mapped:
-                    return {"ok": False, "error": f"Unknown milk '{value}'. Valid milks: {', '.join(sorted(set(VALID_MILKS.values())))}"}
-                self.order_state["milk"] = mapped
-
-            elif field == "extras":
-                if not isinstance(value, str) or not value.strip():
-                    return {"ok": True, "order_state": self.order_state}  # nothing to add
-                parts = [p.strip().lower() for p in value.split(",") if p.strip()]
-                added = []
-                for p in parts:
-                    mapped = VALID_EXTRAS.get(p)
-                    if not mapped:
-                        return {"ok": False, "error": f"Unknown extra '{p}'. Valid extras: {', '.join(sorted(set(VALID_EXTRAS.values()))) }"}
-                    if mapped not in self.order_state["extras"]:
-                        self.order_state["extras"].append(mapped)
-                        added.append(mapped)
-                return {"ok": True, "order_state": self.order_state, "added": added}
-
-            elif field == "drinkType":
-                if not isinstance(value, str) or not value.strip():
-                    return {"ok": False, "error": "Empty drinkType"}
-                v = value.strip()
-                # quick blacklist check
-                if v.lower() in INVALID_DRINK_TERMS:
-                    return {"ok": False, "error": "We only serve coffee and pastries here."}
-                self.order_state["drinkType"] = v
-
-            elif field == "name":
-                if not isinstance(value, str) or not value.strip():
-                    return {"ok": False, "error": "Empty name"}
-                self.order_state["name"] = value.strip()
-
-            return {"ok": True, "order_state": self.order_state}
-
+            return self._apply_update(field, value)
         except Exception as e:
             logger.exception("update_order failed")
             return {"ok": False, "error": f"Exception in update_order: {e}"}
 
+    # -------------------------
+    # TOOL: update_fields
+    # -------------------------
+    @function_tool
+    async def update_fields(self, ctx: RunContext, updates: list[FieldUpdate]):
+        """
+        Updates several fields in one call, e.g.
+        [{"field": "size", "value": "grande"}, {"field": "milk", "value": "oat"}].
+        Every update is attempted; one bad field does not reject the rest. Returns:
+        {"ok": bool, "order_state": {...}, "errors": [{"field": "...", "error": "..."}]}
+        """
+        errors = []
+        for update in updates:
+            field = update["field"]
+            try:
+                result = self._apply_update(field, update["value"])
+            except Exception as e:
+                logger.exception("update_fields failed")
+                result = {"ok": False, "error": f"Exception in update_fields: {e}"}
+            if not result["ok"]:
+                errors.append({"field": field, "error": result["error"]})
+        return {"ok": not errors, "order_state": self.order_state, "errors": errors}
+
     # -------------------------
     # TOOL: get_missing_fields
     # -------------------------
@@ -208,7 +409,7 @@ RULES (must follow):
     @function_tool
     async def finalize_order(self, ctx: RunContext):
         """
-        Write completed order to ORDERS_FILE with metadata (id, timestamp, room if available).
+        Write completed order to ORDERS_DB with metadata (id, timestamp, room if available).
         Returns {"ok": True, "saved": record} or {"ok": False, "error": "..."}
         """
         try:
@@ -216,11 +417,12 @@ RULES (must follow):
             if missing:
                 return {"ok": False, "error": f"Cannot finalize, missing fields: {missing}"}
 
-            saved = dict(self.order_state)  # snapshot
+            # snapshot (extras copied so the queued record never aliases live state)
+            saved = {**self.order_state, "extras": list(self.order_state["extras"])}
 
             # add metadata
             record = {
-                "id": str(uuid.uuid4()),
+                "id": secrets.token_hex(16),
                 "timestamp": time.time(),
                 "order": saved,
             }
@@ -233,19 +435,14 @@ RULES (must follow):
                 # don't fail on room extraction
                 pass
 
-            # safe append with simple lock (good for threads; for multi-process, use filelock or DB)
-            with _orders_file_lock:
-                with open(ORDERS_FILE, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # buffered insert; wait for the writer to commit it so a lost order is never
+            # reported as placed (the order state is kept so it can be retried)
+            committed = await self.order_writer.enqueue(record)
+            if not await committed:
+                return {"ok": False, "error": "Could not save the order, please try again."}
 
             # reset state for next order (instance-local)
-            self.order_state = {
-                "drinkType": None,
-                "size": None,
-                "milk": None,
-                "extras": [],
-                "name": None,
-            }
+            self.order_state = dict(_EMPTY_ORDER, extras=[])
 
             logger.info(f"Order finalized: {record['id']}")
             return {"ok": True, "saved": record}
@@ -266,6 +463,11 @@ async def entrypoint(ctx: JobContext):
         "room": ctx.room.name,
     }
 
+    # Background writer for finalized orders; flush whatever is pending on shutdown
+    order_writer = AsyncOrderWriter(ORDERS_DB)
+    await order_writer.start()
+    ctx.add_shutdown_callback(order_writer.drain)
+
     # Set up a voice AI pipeline using OpenAI, Cartesia, AssemblyAI, and the LiveKit turn detector
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
@@ -328,7 +530,7 @@ async def entrypoint(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=Assistant(order_writer=order_writer),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import orjson
+import pytest
+
+import agent
+from agent import Assistant, AsyncOrderWriter
+
+
+@pytest.fixture(autouse=True)
+def _tmp_storage(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(agent, "ORDERS_DB", str(tmp_path / "orders.db"))
+    monkeypatch.setattr(agent, "ORDERS_FILE", str(tmp_path / "orders.json"))
+
+
+def _record(order_id: str) -> dict:
+    return {"id": order_id, "timestamp": time.time(), "order": {"drinkType": "latte"}}
+
+
+def _order_ids() -> list:
+    with closing(sqlite3.connect(agent.ORDERS_DB)) as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM orders ORDER BY id")]
+
+
+@pytest.mark.asyncio
+async def test_legacy_orders_imported_once() -> None:
+    """The legacy JSON-lines file is imported into an empty table, skipping bad lines."""
+    with open(agent.ORDERS_FILE, "wb") as f:
+        f.write(orjson.dumps(_record("a")) + b"\n")
+        f.write(b"not json\n")
+        f.write(orjson.dumps(_record("b")) + b"\n")
+
+    for _ in range(2):
+        writer = AsyncOrderWriter(agent.ORDERS_DB)
+        await writer.start()
+        await writer.drain()
+
+    assert _order_ids() == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_ids_are_ignored() -> None:
+    """INSERT OR IGNORE keeps the first copy of a record id."""
+    writer = AsyncOrderWriter(agent.ORDERS_DB)
+    await writer.start()
+    first = await writer.enqueue(_record("a"))
+    second = await writer.enqueue(_record("a"))
+    assert await first and await second
+    await writer.drain()
+
+    assert _order_ids() == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_finalize_order_is_written_on_drain() -> None:
+    """A finalized order is in the database once the job's writer is drained and closed."""
+    writer = AsyncOrderWriter(agent.ORDERS_DB)
+    await writer.start()
+    assistant = Assistant(order_writer=writer)
+    assistant.order_state.update(drinkType="latte", size="tall", milk="oat", name="Ana")
+
+    result = await assistant.finalize_order(None)
+    assert result["ok"]
+    await writer.drain()
+
+    # closing the connection checkpointed the WAL back into the database file
+    assert not os.path.exists(agent.ORDERS_DB + "-wal")
+    assert _order_ids() == [result["saved"]["id"]]
+    assert assistant.order_state["drinkType"] is None
+
+
+@pytest.mark.asyncio
+async def test_finalize_order_reports_failed_write(monkeypatch) -> None:
+    """A batch that fails to commit is reported to the caller and the order is kept."""
+    writer = AsyncOrderWriter(agent.ORDERS_DB)
+    await writer.start()
+
+    def fail(rows: list) -> None:
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(writer, "_insert_rows", fail)
+    assistant = Assistant(order_writer=writer)
+    assistant.order_state.update(drinkType="latte", size="tall", milk="oat", name="Ana")
+
+    result = await assistant.finalize_order(None)
+    await writer.drain()
+
+    assert not result["ok"]
+    assert assistant.order_state["drinkType"] == "latte"
+    assert _order_ids() == []
+
+
+def test_writers_on_separate_job_loops() -> None:
+    """Jobs on their own thread and event loop (thread executor) each get a working writer."""
+
+    async def job(order_id: str) -> None:
+        writer = AsyncOrderWriter(agent.ORDERS_DB)
+        await writer.start()
+        assert await (await writer.enqueue(_record(order_id)))
+        await writer.drain()
+
+    for order_id in ("a", "b"):
+        thread = threading.Thread(target=asyncio.run, args=(job(order_id),))
+        thread.start()
+        thread.join()
+
+    assert _order_ids() == ["a", "b"]
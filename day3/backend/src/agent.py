@@ -1,10 +1,13 @@
+import asyncio
 import logging
-import json
 import time
-import uuid
 import os
-from datetime import datetime, timedelta
-from threading import Lock
+import secrets
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Optional
+import orjson
 from dotenv import load_dotenv
 from livekit.agents import (
     Agent,
@@ -27,39 +30,218 @@ logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
-# File configuration
+# Storage configuration
+WELLNESS_DB = "wellness.db"
+# Legacy JSON-lines log; imported into WELLNESS_DB the first time the table is empty
 LOG_FILE = "wellness_log.json"
-_file_lock = Lock()
+
+_WELLNESS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wellness(
+    id TEXT PRIMARY KEY,
+    ts REAL,
+    mood_score INTEGER,
+    has_goals INTEGER,
+    payload BLOB
+);
+CREATE INDEX IF NOT EXISTS wellness_ts ON wellness(ts);
+"""
+
+
+def _entry_ts(entry: dict) -> float:
+    """Epoch time of a log entry. New rows carry `ts`; legacy rows only the formatted date."""
+    ts = entry.get("ts")
+    if ts is not None:
+        return ts
+    return datetime.fromisoformat(entry["date"]).timestamp()
+
+
+def _to_row(entry: dict) -> tuple:
+    score = entry.get("mood_score")
+    return (
+        entry.get("id") or secrets.token_hex(16),
+        _entry_ts(entry),
+        int(score) if score is not None else None,
+        1 if entry.get("goals") else 0,
+        orjson.dumps(entry),
+    )
+
+
+def _import_legacy_log(conn: sqlite3.Connection) -> None:
+    """One-time import of LOG_FILE; INSERT OR IGNORE makes a concurrent import from another worker harmless."""
+    rows = []
+    with open(LOG_FILE, "rb") as f:
+        for line in f:
+            try:
+                rows.append(_to_row(orjson.loads(line)))
+            except Exception:
+                continue  # Skip bad lines
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO wellness VALUES (?, ?, ?, ?, ?)", rows)
+    logger.info(f"Imported {len(rows)} check-in(s) from {LOG_FILE}")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    Opens the writer's connection in WAL mode, so LiveKit job processes can write
+    concurrently while others read. Also creates the schema and runs the one-time
+    legacy import; readers use _connect_reader and skip both.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_WELLNESS_SCHEMA)
+    if os.path.exists(LOG_FILE) and conn.execute("SELECT 1 FROM wellness LIMIT 1").fetchone() is None:
+        _import_legacy_log(conn)
+    return conn
+
+
+def _connect_reader(path: str) -> sqlite3.Connection:
+    """Plain connection for queries; the job's writer has already set up the schema."""
+    return sqlite3.connect(path)
+
+
+class AsyncLogWriter:
+    """
+    Buffers check-in records in memory and inserts them into the database in batches.
+    A background task drains the queue every `batch_size` records or
+    `flush_interval` seconds, so tools never block the event loop on disk I/O.
+    Each batch is one transaction; with WAL + synchronous=NORMAL the fsync is
+    deferred to checkpoints, which happen at the latest when the connection closes.
+    Create one per job: the queue, lock and flush task belong to the event loop that
+    started them, and jobs run on separate loops (threads in `console` mode and on Windows).
+    """
+
+    def __init__(self, path: str, batch_size: int = 10, flush_interval: float = 0.5) -> None:
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        # created lazily in start() so they bind to the running event loop
+        self._queue = None
+        self._lock = None
+        self._task = None
+        # opened in start(), from a worker thread
+        self._conn = None
+
+    async def start(self) -> None:
+        """Starts the flush task and opens the database (schema, legacy import) off the event loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flush_loop())
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await asyncio.to_thread(_connect, self._path)
+
+    async def enqueue(self, record: dict) -> asyncio.Future:
+        """
+        Queues a record and returns a future that resolves once its batch is done:
+        True when committed (visible to readers), False if the write failed.
+        """
+        if self._queue is None:
+            await self.start()
+        committed = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, committed))
+        return committed
+
+    async def drain(self) -> None:
+        """Wait for every queued record to be written, then close the database."""
+        if self._queue is not None:
+            await self._queue.join()
+            self._task.cancel()
+            async with self._lock:
+                await asyncio.to_thread(self.close)
+
+    def close(self) -> None:
+        # closing the last connection checkpoints the WAL into the main database file
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            ok = False
+            try:
+                await self._write(batch)
+                ok = True
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} record(s) to {self._path}")
+            finally:
+                for _, committed in batch:
+                    if not committed.done():
+                        committed.set_result(ok)
+                    self._queue.task_done()
+
+    async def _write(self, batch: list) -> None:
+        rows = [_to_row(r) for r, _ in batch]
+        async with self._lock:
+            await asyncio.to_thread(self._insert_rows, rows)
+
+    def _insert_rows(self, rows: list) -> None:
+        # one transaction per batch
+        if self._conn is None:
+            self._conn = _connect(self._path)
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO wellness VALUES (?, ?, ?, ?, ?)", rows)
+
+
+
+
+def _has_history() -> bool:
+    return os.path.exists(WELLNESS_DB) or os.path.exists(LOG_FILE)
+
 
 def get_last_session_context():
-    """Reads the last line of the JSON file to provide context for the prompt."""
-    if not os.path.exists(LOG_FILE):
+    """Reads the latest check-in to provide context for the prompt."""
+    if not _has_history():
         return "This is the user's first session. Welcome them warmly."
-    
+
     try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            if not lines:
-                return "First session."
-            
-            # Parse the last line
-            last_entry = json.loads(lines[-1])
-            date = last_entry.get("date", "unknown")
-            goals = last_entry.get("goals", [])
-            mood_score = last_entry.get("mood_score", "unknown")
-            mood_text = last_entry.get("mood_text", "unknown")
-            
-            return f"Last session was on {date}. Mood: {mood_text} ({mood_score}/10). Goals set: {', '.join(goals)}."
+        with closing(_connect_reader(WELLNESS_DB)) as conn:
+            row = conn.execute("SELECT payload FROM wellness ORDER BY ts DESC LIMIT 1").fetchone()
+        if row is None:
+            return "This is the user's first session. Welcome them warmly."
+
+        last_entry = orjson.loads(row[0])
+        date = last_entry.get("date", "unknown")
+        goals = last_entry.get("goals", [])
+        mood_score = last_entry.get("mood_score", "unknown")
+        mood_text = last_entry.get("mood_text", "unknown")
+
+        return f"Last session was on {date}. Mood: {mood_text} ({mood_score}/10). Goals set: {', '.join(goals)}."
     except Exception as e:
         logger.error(f"Error reading history: {e}")
         return "Error reading history. Treat as fresh session."
 
-class WellnessCompanion(Agent):
-    def __init__(self, past_context: str) -> None:
-        super().__init__(
-            instructions=f"""
+
+def _weekly_stats() -> tuple:
+    """(average mood, scored entries, days with goals) over the last 7 days."""
+    week_ago = time.time() - 7 * 24 * 60 * 60
+    with closing(_connect_reader(WELLNESS_DB)) as conn:
+        return conn.execute(
+            """
+            SELECT AVG(mood_score), COUNT(mood_score),
+                   COUNT(DISTINCT CASE WHEN has_goals THEN date(ts, 'unixepoch', 'localtime') END)
+            FROM wellness WHERE ts >= ?
+            """,
+            (week_ago,),
+        ).fetchone()
+
+# System prompt template; only the agent id and last-session context vary per session
+_WELLNESS_PROMPT = """
 You are Sam, a secure and private AI wellness companion. 
-Your ID is {str(uuid.uuid4())[:4]}.
+Your ID is {agent_id}.
 
 **CRITICAL SPEAKING STYLE (MUST FOLLOW):**
 - **No Symbols:** Never use slashes (/) or brackets ([]). 
@@ -89,8 +271,18 @@ If the user mentions self-harm, suicide, or severe physical pain:
 **CONTEXT FROM LAST TIME:**
 {past_context}
 """
+
+class WellnessCompanion(Agent):
+    def __init__(self, past_context: str, log_writer: Optional[AsyncLogWriter] = None) -> None:
+        super().__init__(
+            instructions=_WELLNESS_PROMPT.format(
+                agent_id=secrets.token_hex(2), past_context=past_context
+            )
         )
 
+        # the job's check-in writer (entrypoint passes one it drains on shutdown)
+        self.log_writer = log_writer or AsyncLogWriter(WELLNESS_DB)
+
         # Current session state
         self.wellness_state = {
             "mood_text": None,
@@ -123,42 +315,20 @@ If the user mentions self-harm, suicide, or severe physical pain:
     @function_tool
     async def analyze_my_week(self, ctx: RunContext):
         """
-        ADVANCED TOOL: Reads the JSON history to calculate weekly stats.
+        ADVANCED TOOL: Queries the check-in history to calculate weekly stats.
         Use this when the user asks "How has my week been?" or "How am I doing?".
         """
-        if not os.path.exists(LOG_FILE):
+        if not _has_history():
             return "No history available yet."
 
         try:
-            now = datetime.now()
-            week_ago = now - timedelta(days=7)
-            
-            total_score = 0
-            count = 0
-            days_with_goals = 0
-            
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        entry = json.loads(line)
-                        entry_date = datetime.strptime(entry["date"], "%Y-%m-%d %H:%M:%S")
-                        
-                        # Filter for last 7 days
-                        if entry_date >= week_ago:
-                            score = entry.get("mood_score")
-                            if score is not None:
-                                total_score += int(score)
-                                count += 1
-                            
-                            if entry.get("goals") and len(entry["goals"]) > 0:
-                                days_with_goals += 1
-                    except Exception:
-                        continue # Skip bad lines
+            await self.log_writer.start()  # no-op once running; makes sure the schema exists
+            avg_mood, count, days_with_goals = await asyncio.to_thread(_weekly_stats)
 
             if count == 0:
                 return "No entries found for the last 7 days."
 
-            avg_mood = round(total_score / count, 1)
+            avg_mood = round(avg_mood, 1)
             
             return f"""
             WEEKLY REPORT:
@@ -174,16 +344,22 @@ If the user mentions self-harm, suicide, or severe physical pain:
     async def save_checkin(self, ctx: RunContext, summary_note: str):
         """Saves session and ends interaction. summary_note is a 1-sentence recap."""
         self.wellness_state["summary"] = summary_note
-        self.wellness_state["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.wellness_state["id"] = str(uuid.uuid4())
+        # orjson serializes datetimes natively, as "YYYY-MM-DDTHH:MM:SS"
+        self.wellness_state["date"] = datetime.now().replace(microsecond=0)
+        self.wellness_state["ts"] = int(time.time())
+        self.wellness_state["id"] = secrets.token_hex(16)
 
         if not self.wellness_state["mood_score"]:
             self.wellness_state["mood_score"] = 5 # Default neutral if unspecified
 
         try:
-            with _file_lock:
-                with open(LOG_FILE, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(self.wellness_state, ensure_ascii=False) + "\n")
+            # snapshot the state; the writer serializes it later in the background
+            record = dict(self.wellness_state)
+            record["goals"] = list(record["goals"])
+            # wait for the commit so analyze_my_week right after this sees the check-in
+            committed = await self.log_writer.enqueue(record)
+            if not await committed:
+                return {"ok": False, "error": "Could not save the check-in."}
             return {"ok": True, "msg": "Saved. Goodbye."}
         except Exception as e:
             return {"ok": False, "error": str(e)}
@@ -194,8 +370,13 @@ def prewarm(proc: JobProcess):
 async def entrypoint(ctx: JobContext):
     ctx.log_context_fields = {"room": ctx.room.name}
 
-    # 1. LOAD CONTEXT (The Memory)
-    past_context = get_last_session_context()
+    # Background writer for check-ins; flush whatever is pending on shutdown
+    log_writer = AsyncLogWriter(WELLNESS_DB)
+    await log_writer.start()
+    ctx.add_shutdown_callback(log_writer.drain)
+
+    # 1. LOAD CONTEXT (The Memory), off the event loop
+    past_context = await asyncio.to_thread(get_last_session_context)
 
     session = AgentSession(
         stt=deepgram.STT(model="nova-3"),
@@ -228,7 +409,7 @@ async def entrypoint(ctx: JobContext):
 
     # 2. START AGENT
     await session.start(
-        agent=WellnessCompanion(past_context=past_context),
+        agent=WellnessCompanion(past_context=past_context, log_writer=log_writer),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             noise_cancellation=noise_cancellation.BVC(),
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+import agent
+from agent import AsyncLogWriter, WellnessCompanion
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture(autouse=True)
+def _tmp_storage(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(agent, "WELLNESS_DB", str(tmp_path / "wellness.db"))
+    monkeypatch.setattr(agent, "LOG_FILE", str(tmp_path / "wellness_log.json"))
+
+
+def _entry(entry_id: str, ts: float, mood_score: int, goals: list) -> dict:
+    return {
+        "id": entry_id,
+        "ts": ts,
+        "date": "2025-01-01T09:00:00",
+        "mood_text": "Fine",
+        "mood_score": mood_score,
+        "goals": goals,
+    }
+
+
+def _count() -> int:
+    with closing(sqlite3.connect(agent.WELLNESS_DB)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM wellness").fetchone()[0]
+
+
+async def _write(*entries: dict) -> None:
+    writer = AsyncLogWriter(agent.WELLNESS_DB)
+    await writer.start()
+    for entry in entries:
+        assert await (await writer.enqueue(entry))
+    await writer.drain()
+
+
+@pytest.mark.asyncio
+async def test_legacy_log_imported_once() -> None:
+    """Legacy lines (formatted date, no ts/id) are imported into an empty table, skipping bad lines."""
+    with open(agent.LOG_FILE, "wb") as f:
+        f.write(
+            b'{"date": "2025-01-02 03:04:05", "mood_text": "meh", "mood_score": 4, "goals": ["a"]}\n'
+        )
+        f.write(b"not json\n")
+
+    await _write()
+    await _write()
+
+    assert _count() == 1
+    context = agent.get_last_session_context()
+    assert (
+        context
+        == "Last session was on 2025-01-02 03:04:05. Mood: meh (4/10). Goals set: a."
+    )
+
+
+@pytest.mark.asyncio
+async def test_duplicate_ids_are_ignored() -> None:
+    """INSERT OR IGNORE keeps the first copy of an entry id."""
+    now = time.time()
+    await _write(_entry("a", now, 6, []), _entry("a", now, 9, []))
+
+    assert _count() == 1
+
+
+@pytest.mark.asyncio
+async def test_weekly_stats() -> None:
+    """Averages scored entries from the last 7 days and counts distinct days with goals."""
+    now = time.time()
+    await _write(
+        _entry("a", now, 6, ["walk"]),
+        _entry("b", now - 60, 8, ["read"]),  # same day as "a"
+        _entry("c", now - 3 * DAY, 4, []),
+        _entry("d", now - 10 * DAY, 1, ["old"]),  # outside the window
+    )
+
+    avg_mood, count, days_with_goals = agent._weekly_stats()
+    assert (round(avg_mood, 1), count, days_with_goals) == (6.0, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_analyze_my_week_sees_checkin_just_saved() -> None:
+    """save_checkin returns only after the commit, so an immediate weekly report includes it."""
+    writer = AsyncLogWriter(agent.WELLNESS_DB)
+    await writer.start()
+    companion = WellnessCompanion(past_context="First session.", log_writer=writer)
+    companion.wellness_state.update(mood_text="Hopeful", mood_score=7, goals=["walk"])
+
+    assert (await companion.save_checkin(None, "Good day."))["ok"]
+    report = await companion.analyze_my_week(None)
+    await writer.drain()
+
+    assert "Entries: 1" in report
+    assert "Average Mood: 7.0/10" in report
+    # closing the connection checkpointed the WAL back into the database file
+    assert not os.path.exists(agent.WELLNESS_DB + "-wal")
+
+
+def test_writers_on_separate_job_loops() -> None:
+    """Jobs on their own thread and event loop (thread executor) each get a working writer."""
+    for entry_id in ("a", "b"):
+        entry = _entry(entry_id, time.time(), 5, [])
+        thread = threading.Thread(target=asyncio.run, args=(_write(entry),))
+        thread.start()
+        thread.join()
+
+    assert _count() == 2
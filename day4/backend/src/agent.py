@@ -1,6 +1,7 @@
+import asyncio
 import logging
-import json
 import os
+import orjson
 from dotenv import load_dotenv
 from livekit.agents import (
     Agent,
@@ -39,30 +40,19 @@ def load_content():
             logger.error(f"CRITICAL: Content file not found at: {CONTENT_FILE}")
             return []
             
-        with open(CONTENT_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(CONTENT_FILE, "rb") as f:
+            return orjson.loads(f.read())
     except Exception as e:
         logger.error(f"Could not load content: {e}")
         return []
 
-class ActiveRecallCoach(Agent):
-    def __init__(self, session: AgentSession, content: list) -> None:
-        self._session = session
-        self._content = content
-        self._current_mode = "setup"
-
-        # Create a string representation of the topics for the prompt
-        if content:
-            topics_str = "\n".join([f"- {c['title']} (ID: {c['id']})" for c in content])
-        else:
-            topics_str = "No topics available. Please check the content file."
-
-        super().__init__(
-            instructions=f"""
+# Static parts of the coach prompt; only the topic list between them varies per session
+_COACH_INSTRUCTIONS_PREFIX = """
 You are a sophisticated Active Recall Coach. Your goal is to help the user master concepts by switching between teaching, quizzing, and listening.
 
 **AVAILABLE TOPICS:**
-{topics_str}
+"""
+_COACH_INSTRUCTIONS_SUFFIX = """
 
 **YOUR MODES:**
 1. **LEARN Mode (Voice: Matthew):** You explain the concept clearly using the 'summary' data.
@@ -78,6 +68,30 @@ You are a sophisticated Active Recall Coach. Your goal is to help the user maste
 - Keep responses concise.
 - In Teach-Back mode, be encouraging but point out if they missed key details from the 'summary'.
 """
+
+class ActiveRecallCoach(Agent):
+    def __init__(self, session: AgentSession, content: list) -> None:
+        self._session = session
+        self._content = content
+        self._current_mode = "setup"
+
+        # Topic lookups by id and by case-folded title, with each topic serialized once up front
+        self._by_id_json = {}
+        self._by_title_json = {}
+        for c in content:
+            item_json = orjson.dumps(c).decode()
+            # setdefault keeps the first match, like the old linear scan
+            self._by_id_json.setdefault(c["id"], item_json)
+            self._by_title_json.setdefault(c["title"].casefold(), item_json)
+
+        # Create a string representation of the topics for the prompt
+        if content:
+            topics_str = "\n".join([f"- {c['title']} (ID: {c['id']})" for c in content])
+        else:
+            topics_str = "No topics available. Please check the content file."
+
+        super().__init__(
+            instructions="".join((_COACH_INSTRUCTIONS_PREFIX, topics_str, _COACH_INSTRUCTIONS_SUFFIX))
         )
 
     @function_tool
@@ -121,26 +135,28 @@ You are a sophisticated Active Recall Coach. Your goal is to help the user maste
     @function_tool
     async def get_concept_details(self, ctx: RunContext, topic_id: str):
         """Retrieves details for a specific topic ID (e.g., 'variables', 'loops')."""
-        for item in self._content:
-            if item["id"] == topic_id or item["title"].lower() == topic_id.lower():
-                return json.dumps(item)
-        return "Topic not found."
+        item_json = self._by_id_json.get(topic_id) or self._by_title_json.get(topic_id.casefold())
+        return item_json if item_json else "Topic not found."
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
-
-async def entrypoint(ctx: JobContext):
-    # 1. Load Content
-    course_content = load_content()
-
-    # 2. Initialize TTS
-    initial_tts = murf.TTS(
+    # The starting voice is static; build it before a job arrives. set_mode swaps
+    # the session's TTS without touching this instance.
+    proc.userdata["tts"] = murf.TTS(
         model="falcon",
         voice="en-US-Ken",
         style="Conversational",
         text_pacing=False
     )
 
+async def entrypoint(ctx: JobContext):
+    # 1. Load Content (off the event loop, overlapped with the setup below).
+    # run_in_executor submits right away; the setup below never yields to the loop.
+    content_future = asyncio.get_running_loop().run_in_executor(None, load_content)
+
+    # 2. Initialize TTS (prebuilt in prewarm)
+    initial_tts = ctx.proc.userdata["tts"]
+
     # 3. Initialize Session
     session = AgentSession(
         stt=deepgram.STT(model="nova-3"),
@@ -164,6 +180,7 @@ async def entrypoint(ctx: JobContext):
     ctx.add_shutdown_callback(log_usage)
 
     # 4. Start the Active Recall Coach
+    course_content = await content_future
     await session.start(
         agent=ActiveRecallCoach(session=session, content=course_content),
         room=ctx.room,
@@ -1,7 +1,49 @@
+import json
 import os
+import sys
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+CACHE_PATH = os.path.expanduser("~/.cache/check_models.json")
+CACHE_TTL = 24 * 60 * 60  # seconds
+WANTED_METHODS = {"generateContent"}
+
+
+def load_cached_models():
+    """Return the cached model names, or None if the cache is missing or stale."""
+    try:
+        if time.time() - os.path.getmtime(CACHE_PATH) > CACHE_TTL:
+            return None
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_models(names):
+    # write to a temp file and rename so a crashed run never leaves a half-written cache
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp_path = CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def print_models(names):
+    print("\n--- AVAILABLE MODELS ---")
+    for name in names:
+        print(f"- {name}")
+    print("------------------------\n")
+
+
+# Pass --refresh to skip the cache
+names = None if "--refresh" in sys.argv else load_cached_models()
+if names is not None:
+    print(f"✅ Using cached model list ({CACHE_PATH}).")
+    print_models(names)
+    sys.exit(0)
+
 # Load your API key
 load_dotenv(".env.local")
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -12,13 +54,15 @@ else:
     print(f"✅ Found API Key. Checking available models...")
     try:
         genai.configure(api_key=api_key)
-        
-        print("\n--- AVAILABLE MODELS ---")
-        for m in genai.list_models():
-            # We only care about models that can generate content (chat)
-            if 'generateContent' in m.supported_generation_methods:
-                print(f"- {m.name}")
-        print("------------------------\n")
-        
+
+        # We only care about models that can generate content (chat)
+        names = [
+            m.name
+            for m in genai.list_models()
+            if WANTED_METHODS & set(m.supported_generation_methods)
+        ]
+        save_cached_models(names)
+        print_models(names)
+
     except Exception as e:
-        print(f"❌ Error connecting to Google: {e}")
\ No newline at end of file
+        print(f"❌ Error connecting to Google: {e}")
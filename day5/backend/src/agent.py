@@ -1,8 +1,14 @@
+import asyncio
+import functools
 import logging
-import json
-import os
+import mmap
 import time
-from datetime import datetime
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+import orjson
+from typing_extensions import TypedDict
 from dotenv import load_dotenv
 
 from livekit.agents import (
@@ -14,8 +20,12 @@ from livekit.agents import (
     cli,
     function_tool,
     RunContext,
-    RoomInputOptions
+    RoomInputOptions,
+    tokenize,
 )
+# Plugins stay imported at module level: they register themselves on import (main
+# thread only), the turn detector's inference runner must be registered before the
+# worker starts its inference process, and `download-files` only sees imported plugins.
 from livekit.plugins import murf, deepgram, google, silero, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
@@ -23,24 +33,57 @@ load_dotenv(".env.local")
 logger = logging.getLogger("sdr-agent")
 
 # --- Configuration ---
-current_dir = os.path.dirname(os.path.abspath(__file__))
-DATA_FILE = os.path.join(current_dir, "company_data.json")
-LEADS_FILE = os.path.join(current_dir, "leads_captured.json")
-
-class SDRAgent(Agent):
-    def __init__(self, company_info: str) -> None:
-        # We don't need to pass session in __init__ anymore
-        self.lead_form = {
-            "name": None,
-            "company": None,
-            "role": None,
-            "use_case": None,
-            "team_size": None,
-            "timeline": None
-        }
-
-        super().__init__(
-            instructions=f"""
+_HERE = Path(__file__).resolve().parent
+DATA_FILE = _HERE / "company_data.json"
+LEADS_FILE = _HERE / "leads_captured.jsonl"
+
+# Knowledge base used when DATA_FILE can't be read; a single constant keeps the
+# rendered prompt identical (and cacheable) across workers on the failure path too
+_FALLBACK_COMPANY_INFO = "Error loading company data."
+
+@dataclass
+class LeadForm:
+    """Lead details gathered during the call; every field is optional until captured."""
+    name: Optional[str] = None
+    company: Optional[str] = None
+    role: Optional[str] = None
+    use_case: Optional[str] = None
+    team_size: Optional[str] = None
+    timeline: Optional[str] = None
+
+# Arguments of update_lead_info_bulk(). Typed so the tool schema has explicit
+# properties; Gemini rejects OBJECT parameters without any.
+class LeadFields(TypedDict, total=False):
+    name: str
+    company: str
+    role: str
+    use_case: str
+    team_size: str
+    timeline: str
+
+# Lead form schema (tuple keeps the saved key order; frozenset for validation)
+LEAD_FIELDS = tuple(f.name for f in fields(LeadForm))
+VALID_FIELDS = frozenset(LEAD_FIELDS)
+
+# Tool results fed back to the LLM; short constants keep each round trip cheap
+_OK = "ok"
+_BAD = "invalid_field"
+
+# Sentence splitter for LLM -> TTS streaming; stateless (each TTS stream gets its own
+# tokenizer stream), so one instance serves every session. The low min_sentence_len
+# lets a short opener ("Hi there!") start playing on its own
+_SENTENCE_TOKENIZER = tokenize.basic.SentenceTokenizer(min_sentence_len=2)
+
+def _append_lead(record: dict) -> None:
+    """Append one lead as a JSON line (blocking; run it off the event loop)."""
+    line = orjson.dumps(record) + b"\n"
+    with LEADS_FILE.open("ab") as f:
+        f.write(line)
+
+# System prompt template; {company_info} is the only placeholder. Keep it free of
+# per-session values (timestamps, room or caller names): the rendered prompt is
+# byte-identical for every session, which is what Gemini's implicit prompt cache keys on.
+_SDR_INSTRUCTIONS_TEMPLATE = """
 You are Maya, a friendly and professional Sales Development Representative (SDR) for Postman.
 
 **YOUR KNOWLEDGE BASE:**
@@ -59,11 +102,22 @@ You are Maya, a friendly and professional Sales Development Representative (SDR)
 **RULES:**
 - Start by introducing yourself and asking what brought them to Postman today.
 - Be concise. Don't read long paragraphs.
+- When the user shares several details at once, save them all in a single `update_lead_info_bulk` call.
 - If the user asks a question, answer it immediately using the Knowledge Base.
 - If you have answered a question, follow up with a relevant qualification question (e.g., "Does your team currently use any API tools?").
 - **CRITICAL:** When the user indicates they are done (e.g., "Thanks", "I have to go", "That's all"), you MUST call the `end_call_and_save` tool.
 """
-        )
+
+@functools.lru_cache(maxsize=1)
+def _render_instructions(company_info: str) -> str:
+    return _SDR_INSTRUCTIONS_TEMPLATE.format(company_info=company_info)
+
+class SDRAgent(Agent):
+    def __init__(self, company_info: str) -> None:
+        # We don't need to pass session in __init__ anymore
+        self.lead_form = LeadForm()
+
+        super().__init__(instructions=_render_instructions(company_info))
 
     @function_tool
     async def update_lead_info(self, ctx: RunContext, field: str, value: str):
@@ -71,12 +125,26 @@ You are Maya, a friendly and professional Sales Development Representative (SDR)
         Updates a specific field in the lead form.
         field: Must be one of ['name', 'company', 'role', 'use_case', 'team_size', 'timeline']
         value: The information provided by the user.
+        Returns "ok" when saved (continue the conversation) or "invalid_field" if the field name is unknown.
+        """
+        if field in VALID_FIELDS:
+            setattr(self.lead_form, field, value)
+            logger.info("Captured %s: %s", field, value)
+            return _OK
+        return _BAD
+
+    @function_tool
+    async def update_lead_info_bulk(self, ctx: RunContext, lead_fields: LeadFields):
         """
-        if field in self.lead_form:
-            self.lead_form[field] = value
-            logger.info(f"Captured {field}: {value}")
-            return f"Updated {field}. Continue conversation."
-        return "Invalid field name."
+        Updates several lead form fields in one call (e.g. name, company and role together).
+        lead_fields: Only the fields the user provided, mapped to their values.
+        Returns "ok" when saved (continue the conversation).
+        """
+        # the LeadFields schema already limits the keys (undeclared ones are dropped in validation)
+        for field, value in lead_fields.items():
+            setattr(self.lead_form, field, value)
+            logger.info("Captured %s: %s", field, value)
+        return _OK
 
     @function_tool
     async def end_call_and_save(self, ctx: RunContext):
@@ -84,57 +152,78 @@ You are Maya, a friendly and professional Sales Development Representative (SDR)
         Call this when the user says goodbye or wants to end the call. 
         It saves the lead data and returns a final summary string for you to say.
         """
-        # 1. Prepare the record
+        form = self.lead_form
+
+        # 1. Create a verbal summary for the agent to say
+        summary = f"Thanks {form.name or 'there'}. I've noted that you are from {form.company or 'your company'} and looking into Postman for {form.use_case or 'API management'}. I'll have an account executive reach out shortly!"
+
+        # Nothing was captured (e.g. the user left right away): don't store an empty lead
+        if not any(getattr(form, f) for f in LEAD_FIELDS):
+            return summary
+
+        # 2. Prepare the record
         record = {
-            "timestamp": datetime.now().isoformat(),
-            "data": self.lead_form,
-            "status": "QUALIFIED" if self.lead_form['company'] else "INCOMPLETE"
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "data": form,  # orjson serializes dataclasses natively, in field order
+            "status": "QUALIFIED" if form.company else "INCOMPLETE"
         }
 
-        # 2. Save to JSON file (Append mode)
+        # 3. Append one line to the JSONL file (no read-modify-write of past leads)
+        # Awaited before returning, so the lead is on disk before the goodbye is spoken
         try:
-            existing_leads = []
-            if os.path.exists(LEADS_FILE):
-                with open(LEADS_FILE, "r") as f:
-                    try:
-                        existing_leads = json.load(f)
-                    except json.JSONDecodeError:
-                        pass # File might be empty
-            
-            existing_leads.append(record)
-            
-            with open(LEADS_FILE, "w") as f:
-                json.dump(existing_leads, f, indent=2)
-                
+            await asyncio.to_thread(_append_lead, record)
         except Exception as e:
-            logger.error(f"Failed to save lead: {e}")
+            logger.error("Failed to save lead: %s", e)
 
-        # 3. Create a verbal summary for the agent to say
-        summary = f"Thanks {self.lead_form.get('name', 'there')}. I've noted that you are from {self.lead_form.get('company', 'your company')} and looking into Postman for {self.lead_form.get('use_case', 'API management')}. I'll have an account executive reach out shortly!"
         return summary
 
 def load_company_data():
-    """Reads the JSON file to inject into the system prompt."""
+    """Reads the JSON file to inject into the system prompt (re-encoded compactly)."""
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return f.read()
+        # parse straight from the page cache instead of copying the file into a bytes object
+        with DATA_FILE.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            data = orjson.loads(view)
+        return orjson.dumps(data).decode()
     except Exception:
-        return "Error loading company data."
+        logger.exception("load_company_data failed")
+        return _FALLBACK_COMPANY_INFO
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
+    # DATA_FILE is static, so read it once per worker process instead of per job
+    proc.userdata["company_info"] = load_company_data()
+    # Build the first job's agent ahead of time (tool discovery, prompt rendering)
+    proc.userdata["sdr_agent"] = SDRAgent(company_info=proc.userdata["company_info"])
 
 async def entrypoint(ctx: JobContext):
-    # 1. Load Data
-    company_info_text = load_company_data()
+    # 1. Load Data (already read in prewarm)
+    company_info_text = ctx.proc.userdata["company_info"]
 
     # 2. Setup Components
-    tts = murf.TTS(model="falcon", voice="en-US-Matthew", style="Promo", text_pacing=False)
-    stt = deepgram.STT(model="nova-3")
-    llm = google.LLM(model="gemini-2.0-flash-001")
+    # The constructors are synchronous (client setup, credential lookup), so build the
+    # three independent plugins concurrently on worker threads
+    tts, stt, llm = await asyncio.gather(
+        # LLM tokens stream into the TTS and are flushed to Murf per sentence
+        asyncio.to_thread(
+            murf.TTS,
+            model="falcon",
+            voice="en-US-Matthew",
+            style="Promo",
+            tokenizer=_SENTENCE_TOKENIZER,
+            text_pacing=False,
+        ),
+        # Streaming STT: interim transcripts feed the turn detector while the user is still
+        # speaking; a short endpointing window lets finals (and the LLM call) start quickly
+        asyncio.to_thread(
+            deepgram.STT, model="nova-3", interim_results=True, no_delay=True, endpointing_ms=25
+        ),
+        asyncio.to_thread(google.LLM, model="gemini-2.0-flash-001"),
+    )
 
     # 3. Create Agent Instance (Pass only company info)
-    sdr_agent = SDRAgent(company_info=company_info_text)
+    # An Agent carries per-session state (chat context, activity, lead form), so the
+    # prewarmed one is taken exactly once; build one here if prewarm didn't leave it
+    sdr_agent = ctx.proc.userdata.pop("sdr_agent", None) or SDRAgent(company_info=company_info_text)
 
     # 4. Create Session (Do NOT pass agent here)
     session = AgentSession(
@@ -0,0 +1,69 @@
+import json
+
+import orjson
+import pytest
+from livekit.agents.llm.utils import prepare_function_arguments
+
+import agent
+from agent import SDRAgent
+
+# update_lead_info_bulk doesn't use its RunContext; any object stands in for it
+_CALL_CTX = object()
+
+
+async def _call(tool, arguments: dict):
+    """Runs a tool the way the session does: validate the LLM's JSON arguments, then call."""
+    args, kwargs = prepare_function_arguments(
+        fnc=tool, json_arguments=json.dumps(arguments), call_ctx=_CALL_CTX
+    )
+    return await tool(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_sets_only_given_fields() -> None:
+    """A partial dict updates those fields and leaves the rest of the form untouched."""
+    sdr = SDRAgent(company_info="{}")
+
+    result = await _call(
+        sdr.update_lead_info_bulk,
+        {"lead_fields": {"name": "Ana", "company": "Acme", "role": "EM"}},
+    )
+
+    assert result == "ok"
+    assert (sdr.lead_form.name, sdr.lead_form.company, sdr.lead_form.role) == (
+        "Ana",
+        "Acme",
+        "EM",
+    )
+    assert sdr.lead_form.use_case is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_drops_undeclared_keys() -> None:
+    """Keys outside the LeadFields schema are dropped during validation, never set."""
+    sdr = SDRAgent(company_info="{}")
+
+    result = await _call(
+        sdr.update_lead_info_bulk,
+        {"lead_fields": {"name": "Ana", "email": "a@x"}},
+    )
+
+    assert result == "ok"
+    assert sdr.lead_form.name == "Ana"
+    assert not hasattr(sdr.lead_form, "email")
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_is_saved_on_end_call(tmp_path, monkeypatch) -> None:
+    """Fields captured in bulk end up in the appended JSONL lead record."""
+    monkeypatch.setattr(agent, "LEADS_FILE", tmp_path / "leads_captured.jsonl")
+    sdr = SDRAgent(company_info="{}")
+    await _call(sdr.update_lead_info_bulk, {"lead_fields": {"company": "Acme"}})
+
+    await _call(sdr.end_call_and_save, {})
+
+    (line,) = agent.LEADS_FILE.read_bytes().splitlines()
+    record = orjson.loads(line)
+    assert record["status"] == "QUALIFIED"
+    assert record["data"]["company"] == "Acme"
+    assert list(record["data"]) == list(agent.LEAD_FIELDS)